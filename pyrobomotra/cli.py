@@ -31,16 +31,22 @@ asyncio_logger.setLevel(logging.WARNING)
 wdt_logger = logging.getLogger('watchdog_timer')
 wdt_logger.setLevel(logging.WARNING)
 
-is_sighup_received = False
+# set by the SIGHUP handler to reload the configuration
+sighup_event = None
 
 # Robots in Workspace
 robots_in_ws = []
 
 
-def _graceful_shutdown():
+async def _graceful_shutdown():
+    """close the connections of all robots and remove them from the workspace"""
     global robots_in_ws
-    for each_robot in robots_in_ws:
-        del each_robot
+    results = await asyncio.gather(*(each_robot.terminate() for each_robot in robots_in_ws), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error('Error while terminating robot:')
+            logger.error(result)
+    robots_in_ws.clear()
 
 
 def parse_arguments():
@@ -54,14 +60,12 @@ def sighup_handler(name):
     """SIGHUP HANDLER"""
     # logger.debug(f'signal_handler {name}')
     logger.info('Updating the Robotic Configuration')
-    global is_sighup_received
-    is_sighup_received = True
+    sighup_event.set()
 
 
 async def app(eventloop, config):
     """Main application for Robot Motion Tracker"""
     global robots_in_ws
-    global is_sighup_received
 
     while True:
         # Read configuration
@@ -76,32 +80,40 @@ async def app(eventloop, config):
 
         # health server
         health_server = HealthServer(config=robot_motion_tracker_config["health_server"], event_loop=eventloop)
-        eventloop.create_task(health_server.server_loop())
-
-        # robot instantiation
-        robots_config = robot_motion_tracker_config["robots"]
-        loop_interval = robot_motion_tracker_config["attributes"]["interval"]
-        for robot_config in robots_config:
-            # check for protocol key
-            if "protocol" not in robot_config:
-                logger.error("no 'protocol' key found.")
-                sys.exit(-1)
-
-            robo = RobotArm2Tracker(event_loop=eventloop, robot_info=robot_config)
-            robots_in_ws.append(robo)
-            await robo.connect()
-
-        # continuously monitor signal handle and update robot motion
-        while not is_sighup_received:
-            for robo in robots_in_ws:
-                await robo.update()
-            await asyncio.sleep(loop_interval)
-
-        # If SIGHUP Occurs, Delete the instances
-        _graceful_shutdown()
+        await health_server.start()
+        health_task = eventloop.create_task(health_server.server_loop())
+
+        update_tasks = []
+        try:
+            # robot instantiation
+            robots_config = robot_motion_tracker_config["robots"]
+            for robot_config in robots_config:
+                # check for protocol key
+                if "protocol" not in robot_config:
+                    logger.error("no 'protocol' key found.")
+                    sys.exit(-1)
+
+                robo = RobotArm2Tracker(event_loop=eventloop, robot_info=robot_config)
+                robots_in_ws.append(robo)
+                await robo.connect()
+
+            # update robot motion as telemetry arrives until SIGHUP is received
+            update_tasks = [eventloop.create_task(robo.update_loop()) for robo in robots_in_ws]
+            await sighup_event.wait()
+
+        finally:
+            # on SIGHUP or shutdown, stop the updates before Deleting the instances
+            for update_task in update_tasks:
+                update_task.cancel()
+            await asyncio.gather(*update_tasks, return_exceptions=True)
+            await _graceful_shutdown()
+            await health_server.terminate()
+            # server_loop() already logged a failure of the health server, collect its outcome here
+            health_task.cancel()
+            await asyncio.gather(health_task, return_exceptions=True)
 
         # reset sighup handler flag
-        is_sighup_received = False
+        sighup_event.clear()
 
 
 def read_config(yaml_config_file, key):
@@ -117,15 +129,30 @@ def read_config(yaml_config_file, key):
 
 def app_main():
     """Initialization"""
+    global sighup_event
     args = parse_arguments()
     if not os.path.isfile(args.config):
         logging.error("configuration file not readable. Check path to configuration file")
         sys.exit(-1)
 
+    # use the libuv based event loop when the optional `fast` extra is installed
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     event_loop = asyncio.get_event_loop()
+    sighup_event = asyncio.Event()
     event_loop.add_signal_handler(signal.SIGHUP, functools.partial(sighup_handler, name='SIGHUP'))
+    app_task = event_loop.create_task(app(eventloop=event_loop, config=args.config))
     try:
-        event_loop.run_until_complete(app(eventloop=event_loop, config=args.config))
+        event_loop.run_until_complete(app_task)
     except KeyboardInterrupt:
         logger.error('CTRL+C Pressed')
-        _graceful_shutdown()
+        # cancelling app() runs its teardown of the robots and the health server
+        app_task.cancel()
+        try:
+            event_loop.run_until_complete(app_task)
+        except asyncio.CancelledError:
+            pass
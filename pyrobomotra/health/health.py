@@ -1,9 +1,7 @@
-import asyncio, socket
+import asyncio
 import logging
-import sys
 
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG,
-                    format='%(levelname)-8s [%(filename)s:%(lineno)d] %(message)s')
+# logger for this file
 logger = logging.getLogger("Robot:Model")
 
 
@@ -11,27 +9,34 @@ class HealthServer:
     def __init__(self, config, event_loop):
         self.host = ""
         self.port = int(config["port"])
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((self.host, self.port))
-        self.server.listen(8)
-        self.server.setblocking(False)
         self.event_loop = event_loop
+        self.server = None
 
     @staticmethod
-    async def handle_client(client):
-        loop = asyncio.get_event_loop()
-        response = 'OK\n'
-        await loop.sock_sendall(client, response.encode('utf8'))
+    async def handle_client(reader, writer):
+        writer.write(b'OK\n')
+        await writer.drain()
         logger.debug("sent health status")
-        client.close()
+        writer.close()
+
+    async def start(self):
+        """start: bind the health check port, raises OSError when the port cannot be bound"""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, backlog=128)
 
     async def server_loop(self):
         try:
-            while True:
-                self.event_loop = asyncio.get_event_loop()
-                client, _ = await self.event_loop.sock_accept(self.server)
-                self.event_loop.create_task(self.handle_client(client))
+            if self.server is None:
+                await self.start()
+            async with self.server:
+                await self.server.serve_forever()
         except Exception as e:
-            return
-
+            logger.error('Exception in Health Server')
+            logger.error(e)
+            raise
 
+    async def terminate(self):
+        """terminate: stop accepting health checks and release the port"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
@@ -1,5 +1,5 @@
 import sys
-import redis
+import redis.asyncio as redis
 import logging
 
 # logger for this file
@@ -18,24 +18,32 @@ class RedisDB:
         self.port = port
         self.password = password
         self.db = redis.Redis(host=self.host, port=self.port, password=self.password)
-        self.test_connection()
 
-    def test_connection(self):
+    async def test_connection(self):
         try:
-            self.db.ping()
+            await self.db.ping()
         except Exception as e:
             logging.critical("Redis connection Error")
             logging.critical(e)
             sys.exit(-1)
 
-    def get(self, key):
-        result = self.db.get(name=key)
+    async def get(self, key):
+        result = await self.db.get(name=key)
         return result
 
-    def set(self, key, value, ttl=-1):
+    async def get_many(self, keys):
+        """get_many: fetch several keys in one round-trip, missing keys are returned as None"""
+        result = await self.db.mget(keys)
+        return result
+
+    async def set(self, key, value, ttl=-1):
         if ttl > 0:
-            self.db.set(name=key, value=value, keepttl=ttl)
-        self.db.set(name=key, value=value)
+            await self.db.set(name=key, value=value, keepttl=ttl)
+        await self.db.set(name=key, value=value)
+
+    async def terminate(self):
+        """terminate: close the connection to the database"""
+        await self.db.close()
 
     def publish(self):
         pass
@@ -9,8 +9,11 @@ ChangeLog:
     - update: initial version of wrapper class
     - update: Apply linting
     - update: Refactor Class with documentation
+    - update: add BatchPublisher to group outbound messages into confirm bursts
+    - update: configurable subscriber prefetch and publisher confirms
 """
 
+import asyncio
 import sys
 import logging
 from aio_pika import connect_robust, Message, DeliveryMode, ExchangeType, IncomingMessage
@@ -18,12 +21,12 @@ from aio_pika import exceptions as aio_pika_exception
 
 # logger for this file
 logger = logging.getLogger("PubSub:AMQP")
-logging.basicConfig(stream=sys.stdout,
-                    level=logging.DEBUG,
-                    format='%(levelname)-2s [%(filename)s:%(lineno)d] %(message)s')
 aio_pika_logger = logging.getLogger('aio_pika')
 aio_pika_logger.setLevel(logging.ERROR)
 
+# queued by BatchPublisher.terminate() behind the buffered messages to stop flushing
+_STOP_FLUSHING = object()
+
 
 class PubSubAMQP:
     def __init__(self, eventloop, config_file, binding_suffix, app_callback=None):
@@ -33,6 +36,9 @@ class PubSubAMQP:
         - binding_suffix: Binding Suffix necessary for Publishing on dedicated routing key
         - mode: Publish/Subscribe (default: 'publisher')
         - app_callback: Callback function  (default: None)
+        config_file may optionally contain:
+            - prefetch_count: unacknowledged messages the broker delivers to a subscriber in advance (default: 64)
+            - publisher_confirms: wait for broker confirms of published messages (default: True)
         """
         try:
             self.broker_info = config_file["broker"]
@@ -46,6 +52,8 @@ class PubSubAMQP:
             self.channel = None
             self.exchange = None
             self.app_callback = app_callback
+            self.prefetch_count = int(config_file.get("prefetch_count", 64))
+            self.publisher_confirms = bool(config_file.get("publisher_confirms", True))
 
             logger.debug('RabbitMQ Exchange: %s', self.exchange_name)
             logger.debug('Binding Suffix: %s', self.binding_suffix)
@@ -70,7 +78,7 @@ class PubSubAMQP:
                     "connection_name": "robot-tracker"}
                 }
             )
-            self.channel = await self.connection.channel()
+            self.channel = await self.connection.channel(publisher_confirms=self.publisher_confirms)
             if mode == "subscriber":
                 await self._sub_connect()
         except aio_pika_exception.AMQPException as e:
@@ -81,7 +89,7 @@ class PubSubAMQP:
     async def _sub_connect(self):
         """_sub_connect: private method for subscribing data to Broker. Setup dedicated channel, exchange"""
         try:
-            await self.channel.set_qos(prefetch_count=1)
+            await self.channel.set_qos(prefetch_count=self.prefetch_count)
             queue = await self.channel.declare_queue(self.queue_name, durable=True)
             await queue.consume(self._sub_on_message)
         except Exception as e:
@@ -94,7 +102,8 @@ class PubSubAMQP:
         """_sub_on_message: private method to handle consumption of message during subscription"""
 
         async with message.process():
-            logger.debug(f"msg received: Exchange {message.exchange}, Routing {message.routing_key}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("msg received: Exchange %s, Routing %s", message.exchange, message.routing_key)
             if self.app_callback is not None:
                 await self.app_callback(
                     exchange_name=message.exchange,
@@ -124,9 +133,107 @@ class PubSubAMQP:
             await self.terminate()
             sys.exit(-1)
 
+    async def publish_batch(self, message_contents, priority=0):
+        """publish_batch: Produce several Messages to Message Broker in one burst
+        - message_contents: list of payloads of messages to be published
+        - priority: message priority
+        All messages are written before waiting on the broker, so their publisher confirms are awaited together
+        """
+        try:
+            exchange = self.channel.default_exchange
+            await asyncio.gather(*(
+                exchange.publish(
+                    Message(
+                        body=message_content,
+                        delivery_mode=DeliveryMode.PERSISTENT,
+                        priority=priority
+                    ),
+                    routing_key=self.queue_name
+                ) for message_content in message_contents
+            ))
+        except aio_pika_exception.AMQPException as e:
+            logger.error(e)
+            await self.terminate()
+            sys.exit(-1)
+        except Exception as e:
+            logger.error('Exception during Publishing Batch to Broker')
+            logger.error(e)
+            await self.terminate()
+            sys.exit(-1)
+
     async def terminate(self):
-        """terminate: close the connection to the broker"""
-        await self.connection.close()
+        """terminate: close the connection to the broker, nothing to do when never connected"""
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
 
     def get_callback_handler_name(self):
-        return self.cb_handler
\ No newline at end of file
+        return self.cb_handler
+
+
+class BatchPublisher:
+    def __init__(self, publisher, config=None):
+        """BatchPublisher: buffer outbound messages of a PubSubAMQP publisher and flush them in bursts
+        - publisher: PubSubAMQP instance used for publishing
+        - config: Python Dictionary with batching configuration (default: None)
+            - max_batch_size: maximum number of messages per burst (default: 64)
+            - max_batch_open_ms: time a burst stays open for more messages in milliseconds (default: 5)
+            - max_inflight_outbound_batches: number of full bursts that may be buffered (default: 4)
+        """
+        if config is None:
+            config = {}
+        self.publisher = publisher
+        self.exchange_name = publisher.exchange_name
+        self.max_batch_size = int(config.get("max_batch_size", 64))
+        self.max_batch_open = float(config.get("max_batch_open_ms", 5)) / 1000
+        max_inflight_outbound_batches = int(config.get("max_inflight_outbound_batches", 4))
+        self.queue = asyncio.Queue(maxsize=self.max_batch_size * max_inflight_outbound_batches)
+        self._flush_task = None
+        self._stopping = False
+
+        logger.debug('Batch Size: %s, Batch Open: %s s', self.max_batch_size, self.max_batch_open)
+
+    async def connect(self, mode="publisher"):
+        """connect: Connect to the Message Broker and start flushing buffered messages"""
+        await self.publisher.connect(mode=mode)
+        self._flush_task = self.publisher.eventloop.create_task(self._flush_loop())
+
+    async def publish(self, message_content):
+        """publish: buffer a Message for the next burst, waits only while the buffer is full
+        - message_content: payload of message to be published
+        """
+        await self.queue.put(message_content)
+
+    def _drain(self, batch):
+        """_drain: private method to move buffered messages into the batch up to max_batch_size"""
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            message_content = self.queue.get_nowait()
+            if message_content is _STOP_FLUSHING:
+                self._stopping = True
+                break
+            batch.append(message_content)
+        return batch
+
+    async def _flush_loop(self):
+        """_flush_loop: private method publishing a burst whenever it is full or its open window elapsed"""
+        while not self._stopping:
+            message_content = await self.queue.get()
+            if message_content is _STOP_FLUSHING:
+                return
+            batch = [message_content]
+            if self.queue.qsize() < self.max_batch_size - 1 and self.max_batch_open > 0:
+                await asyncio.sleep(self.max_batch_open)
+            await self.publisher.publish_batch(self._drain(batch))
+
+    async def terminate(self):
+        """terminate: publish buffered messages and close the connection to the broker"""
+        # without a started flush task the publisher never connected and there is nothing to flush
+        if self._flush_task is not None:
+            if not self._flush_task.done():
+                # the flush loop publishes every message queued before the marker, including an in-flight burst
+                await self.queue.put(_STOP_FLUSHING)
+                await self._flush_task
+            self._flush_task = None
+            while not self.queue.empty():
+                await self.publisher.publish_batch(self._drain([]))
+        await self.publisher.terminate()
@@ -1,8 +1,9 @@
 from __future__ import generator_stop
 from __future__ import annotations
 
-from .AMQP import PubSubAMQP
+from .AMQP import PubSubAMQP, BatchPublisher
 
 __all__ = [
-    'PubSubAMQP'
+    'PubSubAMQP',
+    'BatchPublisher'
 ]
@@ -43,30 +43,53 @@ Changelog:
 
 """
 import asyncio
-import json
+import functools
 import logging
 import math
-import queue
 import sys
 import time
 import traceback
-import ast
-import numpy as np
-from pyrobomotra.pub_sub import PubSubAMQP
+import orjson
+from pyrobomotra.pub_sub import PubSubAMQP, BatchPublisher
 from pyrobomotra.in_mem_db import RedisDB
 
 # logger for this file
+logger = logging.getLogger("Robot:Model")
 
+_monotonic_ns = time.monotonic_ns
 
-logging.basicConfig(stream=sys.stdout, level=logging.DEBUG,
-                    format='%(levelname)-8s [%(filename)s:%(lineno)d] %(message)s')
-logger = logging.getLogger("Robot:Model")
+
+@functools.lru_cache(maxsize=1024)
+def _state_key(robot_id):
+    """_state_key: in-memory database key of a robot state, encoded once for recently seen robot ids"""
+    return f"robot_{robot_id}".encode()
+
+
+# fields a telemetry message must carry to be tracked
+_TELEMETRY_FIELDS = frozenset(("id", "shoulder", "theta1", "theta2", "base"))
 
 
 class RobotArm2Tracker:
     """This class implements Robot Arm with 2 joint ARM
     """
 
+    __slots__ = (
+        'length_shoulder_to_elbow',
+        'length_elbow_to_gripper',
+        'base',
+        'shoulder',
+        'consume_telemetry_queue',
+        '_has_work',
+        'max_telemetry_batch',
+        '_epoch_offset_ns',
+        'redis_db',
+        'eventloop',
+        'publishers',
+        'subscribers',
+        '_publisher_by_exchange',
+        '_subscriber_handlers'
+    )
+
     def __init__(self, event_loop, robot_info):
         """RobotArm2: Two-Joint Robotic Arm Model
         - event_loop: Python AsyncIO Eventloop
@@ -79,10 +102,14 @@ class RobotArm2Tracker:
 
             self.length_shoulder_to_elbow = 0.0
             self.length_elbow_to_gripper = 0.0
-            self.base = [0.0, 0.0]
-            self.shoulder = [0.0, 0.0]
-
-            self.consume_telemetry_queue = queue.SimpleQueue()
+            self.base = (0.0, 0.0)
+            self.shoulder = (0.0, 0.0)
+
+            self.consume_telemetry_queue = asyncio.Queue()
+            self._has_work = asyncio.Event()
+            self.max_telemetry_batch = int(robot_info.get("max_telemetry_batch", 64))
+            # wall clock sampled once, timestamps advance with the monotonic clock and never jump with NTP
+            self._epoch_offset_ns = time.time_ns() - _monotonic_ns()
             self.redis_db = RedisDB(host=robot_info["in_mem_db"]["server"]["address"],
                                     port=robot_info["in_mem_db"]["server"]["port"],
                                     password=robot_info["in_mem_db"]["credentials"]["password"])
@@ -95,15 +122,19 @@ class RobotArm2Tracker:
                     if publisher["type"] == "amq":
                         logger.debug('Setting Up AMQP Publisher for Robot')
                         self.publishers.append(
-                            PubSubAMQP(
-                                eventloop=self.eventloop,
-                                config_file=publisher,
-                                binding_suffix=""
+                            BatchPublisher(
+                                publisher=PubSubAMQP(
+                                    eventloop=self.eventloop,
+                                    config_file=publisher,
+                                    binding_suffix=""
+                                ),
+                                config=publisher.get("batch")
                             )
                         )
                     else:
                         logger.error("Provide protocol amq config")
                         raise AssertionError("Provide protocol amq config")
+            self._publisher_by_exchange = {publisher.exchange_name: publisher for publisher in self.publishers}
 
             if robot_info["protocol"]["subscribers"] is not None:
                 for subscribers in robot_info["protocol"]["subscribers"]:
@@ -121,6 +152,17 @@ class RobotArm2Tracker:
                         logger.error("Provide protocol amq config")
                         raise AssertionError("Provide protocol amq config")
 
+            # resolve the message handlers of all subscribers once instead of per message
+            self._subscriber_handlers = []
+            for subscriber in self.subscribers:
+                cb_str = subscriber.get_callback_handler_name()
+                if cb_str is not None:
+                    cb = getattr(self, cb_str, None)
+                    if cb is None:
+                        logging.critical(f'No Matching handler found for {cb_str}')
+                        continue
+                    self._subscriber_handlers.append(cb)
+
         except Exception as e:
             logger.error("Exception during creation of RobotArm2Tracker", e)
             sys.exit(-1)
@@ -129,110 +171,173 @@ class RobotArm2Tracker:
         """publish: publish robotic arm movement data to Message Broker
         - msg: message content
         """
-        for publisher in self.publishers:
-            if exchange_name == publisher.exchange_name:
-                await publisher.publish(message_content=msg)
-                logger.debug(f'Pub: msg{msg}')
+        publisher = self._publisher_by_exchange.get(exchange_name)
+        if publisher is not None:
+            await publisher.publish(message_content=msg)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Pub: msg %s', msg)
+
+    async def publish_many(self, exchange_names, msg):
+        """publish_many: publish the same robotic arm movement data to several exchanges of the Message Broker
+        - exchange_names: names of the exchanges
+        - msg: message content
+        """
+        publisher_by_exchange = self._publisher_by_exchange
+        await asyncio.gather(*(
+            publisher_by_exchange[exchange_name].publish(message_content=msg)
+            for exchange_name in exchange_names if exchange_name in publisher_by_exchange
+        ))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Pub: msg %s', msg)
 
     async def connect(self):
-        """connect: connect to the Message Broker
+        """connect: connect to the in-memory database and the Message Broker
         """
+        await self.redis_db.test_connection()
+
         for publisher in self.publishers:
             await publisher.connect()
 
         for subscriber in self.subscribers:
             await subscriber.connect(mode="subscriber")
 
+    async def terminate(self):
+        """terminate: flush the publishers and close the connections to the Message Broker and the in-memory database
+        """
+        await asyncio.gather(
+            *(publisher.terminate() for publisher in self.publishers),
+            *(subscriber.terminate() for subscriber in self.subscribers)
+        )
+        await self.redis_db.terminate()
+
     def update_states(self, state_information):
         self.length_shoulder_to_elbow = float(state_information["length_shoulder_to_elbow"])
         self.length_elbow_to_gripper = float(state_information["length_elbow_to_gripper"])
-        self.base = state_information["base"]
-        self.shoulder = state_information["shoulder"]
-
-    def get_states_from_db(self, robot_id):
-        name = "robot_" + robot_id
-        db_result = self.redis_db.get(key=name)
-        if db_result is None:
-            return None
-        result = json.loads(db_result)
-        return result
-
-    def restore_states_in_db(self, robot_id):
+        base_x, base_y = state_information["base"]
+        self.base = (float(base_x), float(base_y))
+        shoulder_x, shoulder_y = state_information["shoulder"]
+        self.shoulder = (float(shoulder_x), float(shoulder_y))
+
+    def _make_payload_builder(self, robot_id):
+        """_make_payload_builder: specialize the payload encoding for a robot
+        - robot_id: id of the robot whose states are currently loaded
+        returns build_payload(elbow_x, elbow_y, wrist_x, wrist_y, timestamp) producing the JSON payload bytes
+        """
+        # constant fields are encoded once, the closing '}' is replaced to append the per-sample fields
+        identity_prefix = orjson.dumps({
+            "id": robot_id,
+            "base": self.base,
+            "shoulder": self.shoulder
+        })[:-1] + b","
+        dumps = orjson.dumps
+
+        def build_payload(elbow_x, elbow_y, wrist_x, wrist_y, timestamp):
+            return identity_prefix + dumps({
+                "timestamp": timestamp,
+                "elbow": (elbow_x, elbow_y),
+                "wrist": (wrist_x, wrist_y)
+            })[1:]
+        return build_payload
+
+    async def get_states_many(self, robot_ids):
+        """get_states_many: fetch the states of several robots with a single MGET
+        - robot_ids: ids of the robots
+        returns a list of state dictionaries (None for unknown robots) in the order of robot_ids
+        """
+        db_results = await self.redis_db.get_many(keys=[_state_key(robot_id) for robot_id in robot_ids])
+        return [orjson.loads(db_result) if db_result is not None else None for db_result in db_results]
+
+    async def restore_states_in_db(self, robot_id):
         state_information = {
             "base": self.base,
             "shoulder": self.shoulder,
             "length_shoulder_to_elbow": self.length_shoulder_to_elbow,
             "length_elbow_to_gripper": self.length_elbow_to_gripper
         }
-        name = "robot_" + robot_id
-        json_state_information = json.dumps(state_information)
-        self.redis_db.set(key=name, value=json_state_information)
+        json_state_information = orjson.dumps(state_information)
+        await self.redis_db.set(key=_state_key(robot_id), value=json_state_information)
 
     async def update(self):
 
-        if not self.consume_telemetry_queue.empty():
-            new_measurement = self.consume_telemetry_queue.get_nowait()
-
-            new_measurement_id = new_measurement["id"]
-            state_info = self.get_states_from_db(new_measurement_id)
-
-            if state_info is not None and new_measurement_id is not None:
-                self.update_states(state_information=state_info)
-                kinematic_result = self.get_forward_kinematics(
-                    theta1=new_measurement["theta1"],
-                    theta2=new_measurement["theta2"]
-                )
-                result_rmt_robot = {
-                    "id": new_measurement["id"],
-                    "base": (self.base[0], self.base[1]),
-                    "shoulder": (self.shoulder[0], self.shoulder[1]),
-                    "timestamp": time.time_ns()
-                }
-                result_rmt_robot.update(kinematic_result)
-                await self.publish(
-                    exchange_name="rmt_robot",
-                    msg=json.dumps(result_rmt_robot).encode())
-                await self.publish(
-                    exchange_name="visual",
-                    msg=json.dumps(result_rmt_robot).encode())
-
-    def get_forward_kinematics(self, theta1, theta2):
-        """get_forward_kinematics: Forward Kinematics for the Robotic Arm"""
-        elbow = self.shoulder + \
-                np.array(
-                    [
-                        self.length_shoulder_to_elbow * np.cos(theta1),
-                        self.length_shoulder_to_elbow * np.sin(theta1)
-                    ]
-                )
-
-        wrist = elbow + \
-                np.array(
-                    [
-                        self.length_elbow_to_gripper * np.cos(theta1 + theta2),
-                        self.length_elbow_to_gripper * np.sin(theta1 + theta2)
-                    ]
-                )
-
-        result = dict(
-            elbow=(elbow[0], elbow[1]),
-            wrist=(wrist[0], wrist[1])
-        )
-        return result
+        # drain up to max_telemetry_batch samples per tick, leftovers are handled on the next tick
+        batch = []
+        while len(batch) < self.max_telemetry_batch:
+            try:
+                batch.append(self.consume_telemetry_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+        # look up each robot once per drain, however many of its samples are queued
+        robot_ids = list(dict.fromkeys(
+            new_measurement["id"] for new_measurement in batch if new_measurement["id"] is not None
+        ))
+        if not robot_ids:
+            return
+        states_by_id = dict(zip(robot_ids, await self.get_states_many(robot_ids)))
+
+        cos = math.cos
+        sin = math.sin
+        epoch_offset_ns = self._epoch_offset_ns
+        payload_builder_by_id = {}
+        for new_measurement in batch:
+            robot_id = new_measurement["id"]
+            state_info = states_by_id.get(robot_id)
+
+            if state_info is not None:
+                try:
+                    self.update_states(state_information=state_info)
+                    build_payload = payload_builder_by_id.get(robot_id)
+                    if build_payload is None:
+                        build_payload = payload_builder_by_id[robot_id] = self._make_payload_builder(robot_id)
+
+                    # Forward Kinematics for the Robotic Arm
+                    theta1 = new_measurement["theta1"]
+                    theta12 = theta1 + new_measurement["theta2"]
+                    length_shoulder_to_elbow = self.length_shoulder_to_elbow
+                    length_elbow_to_gripper = self.length_elbow_to_gripper
+                    shoulder_x, shoulder_y = self.shoulder
+                    elbow_x = shoulder_x + length_shoulder_to_elbow * cos(theta1)
+                    elbow_y = shoulder_y + length_shoulder_to_elbow * sin(theta1)
+                    wrist_x = elbow_x + length_elbow_to_gripper * cos(theta12)
+                    wrist_y = elbow_y + length_elbow_to_gripper * sin(theta12)
+
+                    payload = build_payload(elbow_x, elbow_y, wrist_x, wrist_y, epoch_offset_ns + _monotonic_ns())
+                except Exception as e:
+                    # a malformed sample or robot state only skips that sample
+                    logger.error('Skipping telemetry sample of robot %s', robot_id)
+                    logger.error(e)
+                    continue
+                await self.publish_many(exchange_names=("rmt_robot", "visual"), msg=payload)
+
+    async def update_loop(self):
+        """update_loop: run update() whenever the subscriber has queued new telemetry
+        """
+        while True:
+            await self._has_work.wait()
+            self._has_work.clear()
+            try:
+                await self.update()
+            except Exception as e:
+                # state lookup or publishing failed, drop the rest of the drain and keep tracking the following telemetry
+                logger.error('Exception during update of RobotArm2Tracker, remaining telemetry of the drain dropped')
+                logger.error(e)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                logger.error(repr(traceback.format_exception(exc_type, exc_value, exc_traceback)))
+            # samples beyond max_telemetry_batch are left queued, process them without waiting for new telemetry
+            if not self.consume_telemetry_queue.empty():
+                self._has_work.set()
 
     def __get_all_states__(self):
-        logger.debug(vars(self))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug({slot: getattr(self, slot, None) for slot in self.__slots__})
 
     async def robot_msg_handler(self, exchange_name, binding_name, message_body):
 
-        msg_attributes = message_body.keys()
-        if ("id" in msg_attributes) and \
-                ("shoulder" in msg_attributes) and \
-                ("theta1" in msg_attributes) and \
-                ("theta2" in msg_attributes) and \
-                ("base" in msg_attributes):
-            logger.debug(f'sub: exchange {exchange_name}: msg {message_body}')
+        if _TELEMETRY_FIELDS <= message_body.keys():
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('sub: exchange %s: msg %s', exchange_name, message_body)
             self.consume_telemetry_queue.put_nowait(item=message_body)
+            self._has_work.set()
 
     async def consume_telemetry_msgs(self, **kwargs):
         """
@@ -242,20 +347,11 @@ class RobotArm2Tracker:
         try:
             exchange_name = kwargs["exchange_name"]
             binding_name = kwargs["binding_name"]
-            message_body = json.loads(kwargs["message_body"])
+            message_body = orjson.loads(kwargs["message_body"])
 
-            # check for matching subscriber with exchange and binding name in all subscribers
-            for subscriber in self.subscribers:
-                # if subscriber.exchange_name == exchange_name:
-                cb_str = subscriber.get_callback_handler_name()
-                if cb_str is not None:
-                    try:
-                        cb = getattr(self, cb_str)
-                    except:
-                        logging.critical(f'No Matching handler found for {cb_str}')
-                        continue
-                    if cb is not None:
-                        await cb(exchange_name=exchange_name, binding_name=binding_name, message_body=message_body)
+            # dispatch to the handlers of all subscribers
+            for cb in self._subscriber_handlers:
+                await cb(exchange_name=exchange_name, binding_name=binding_name, message_body=message_body)
 
         except AssertionError as e:
             logging.critical(e)
@@ -29,6 +29,9 @@ setup(
     packages=find_packages(),
     scripts=['bin/robot-motion-tracker'],
     install_requires=reqs,
+    extras_require={
+        'fast': ['uvloop==0.16.0']
+    },
     include_data_package=True,
     zip_safe=False
 )